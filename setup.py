@@ -9,6 +9,7 @@ setup(
     install_requires=[
         "cryptography",
         "pyperclip",
+        "pyobjc-framework-Cocoa; sys_platform == 'darwin'",
     ],
     entry_points={
         "console_scripts": [
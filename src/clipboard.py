@@ -1,8 +1,207 @@
+import os
+import sys
+import atexit
 import subprocess
 import platform
+import shutil
+import heapq
 import threading
 import time
 
+class _CommandBackend:
+    """Pipe text into an external clipboard utility (xclip, xsel, pbcopy, clip)"""
+    def __init__(self, command):
+        self.command = command
+        
+    def set(self, text):
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE)
+        process.communicate(input=text.encode())
+        return process.returncode == 0
+
+class _MacBackend:
+    """Write to the general pasteboard through pyobjc's AppKit binding"""
+    def __init__(self):
+        from AppKit import NSPasteboard, NSPasteboardTypeString
+        self.pasteboard = NSPasteboard.generalPasteboard()
+        self.pasteboard_type = NSPasteboardTypeString
+        
+    def set(self, text):
+        self.pasteboard.clearContents()
+        return bool(self.pasteboard.setString_forType_(text, self.pasteboard_type))
+
+class _WindowsBackend:
+    """Write CF_UNICODETEXT directly through user32/kernel32 via ctypes"""
+    CF_UNICODETEXT = 13
+    GMEM_MOVEABLE = 0x0002
+    
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        
+        # Declare handle-sized signatures so pointers aren't truncated on 64-bit
+        self.user32.OpenClipboard.argtypes = [wintypes.HWND]
+        self.user32.OpenClipboard.restype = wintypes.BOOL
+        self.user32.EmptyClipboard.restype = wintypes.BOOL
+        self.user32.CloseClipboard.restype = wintypes.BOOL
+        self.user32.SetClipboardData.argtypes = [wintypes.UINT, wintypes.HANDLE]
+        self.user32.SetClipboardData.restype = wintypes.HANDLE
+        self.kernel32.GlobalAlloc.argtypes = [wintypes.UINT, ctypes.c_size_t]
+        self.kernel32.GlobalAlloc.restype = wintypes.HGLOBAL
+        self.kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalLock.restype = wintypes.LPVOID
+        self.kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalUnlock.restype = wintypes.BOOL
+        self.kernel32.GlobalFree.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalFree.restype = wintypes.HGLOBAL
+        
+    def set(self, text):
+        ctypes = self.ctypes
+        if not self.user32.OpenClipboard(None):
+            return False
+        try:
+            self.user32.EmptyClipboard()
+            if not text:
+                return True
+                
+            data = ctypes.create_unicode_buffer(text)
+            size = ctypes.sizeof(data)
+            handle = self.kernel32.GlobalAlloc(self.GMEM_MOVEABLE, size)
+            if not handle:
+                return False
+            locked = self.kernel32.GlobalLock(handle)
+            if not locked:
+                self.kernel32.GlobalFree(handle)
+                return False
+            ctypes.memmove(locked, data, size)
+            self.kernel32.GlobalUnlock(handle)
+            
+            # On success the clipboard owns the memory; only free it on failure
+            if not self.user32.SetClipboardData(self.CF_UNICODETEXT, handle):
+                self.kernel32.GlobalFree(handle)
+                return False
+            return True
+        finally:
+            self.user32.CloseClipboard()
+
+def _select_backend():
+    """Pick the clipboard backend for this platform, or None if unavailable."""
+    system = platform.system()
+    
+    if system == 'Linux':
+        # The X selection is served by its owner, so it has to outlive this
+        # short-lived process; xclip/xsel fork a small daemon to do exactly that.
+        # Resolve the helper once here rather than on every copy.
+        if shutil.which('xclip'):
+            return _CommandBackend(['xclip', '-selection', 'clipboard'])
+        if shutil.which('xsel'):
+            return _CommandBackend(['xsel', '--clipboard', '--input'])
+        return None
+        
+    elif system == 'Darwin':  # macOS
+        try:
+            return _MacBackend()
+        except ImportError:
+            # pyobjc not installed, fall back to pbcopy
+            return _CommandBackend(['pbcopy'])
+            
+    elif system == 'Windows':
+        try:
+            return _WindowsBackend()
+        except (AttributeError, OSError):
+            return _CommandBackend(['clip'])
+            
+    return None
+
+_backend = _select_backend()
+
+def _secure_clear(backend, rounds=16):
+    """
+    Overwrite the clipboard with random data several times, then empty it.
+    
+    Clipboard history managers keep recent entries, so a single empty write
+    would leave the password in their history.
+    
+    Args:
+        backend: The clipboard backend to write through
+        rounds: Number of random overwrites before the final empty write
+    """
+    # 256 characters of random hex, generated once per clear
+    pad = os.urandom(128).hex()
+    for _ in range(rounds):
+        backend.set(pad)
+    backend.set("")
+
+# Pending clipboard clears as a min-heap of (deadline, clear_after), served
+# by a single daemon thread that is started on first use. Clears still
+# pending when the process exits are handed to a detached child process.
+_clear_queue = []
+_clear_condition = threading.Condition()
+_scheduler_thread = None
+
+def _run_scheduler():
+    """Clear the clipboard as each queued deadline expires"""
+    while True:
+        with _clear_condition:
+            while not _clear_queue:
+                _clear_condition.wait()
+            deadline, clear_after = _clear_queue[0]
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                # Re-check on wake-up, an earlier deadline may have been pushed
+                _clear_condition.wait(remaining)
+                continue
+            heapq.heappop(_clear_queue)
+            
+        try:
+            _secure_clear(_backend)
+            print(f"Clipboard cleared after {clear_after} seconds")
+        except Exception:
+            pass
+
+def _schedule_clear(clear_after):
+    """Queue a clipboard clear clear_after seconds from now"""
+    global _scheduler_thread
+    
+    with _clear_condition:
+        heapq.heappush(_clear_queue, (time.monotonic() + clear_after, clear_after))
+        if _scheduler_thread is None:
+            _scheduler_thread = threading.Thread(target=_run_scheduler)
+            _scheduler_thread.daemon = True
+            _scheduler_thread.start()
+            atexit.register(_hand_off_pending_clears)
+        _clear_condition.notify()
+
+def _hand_off_pending_clears():
+    """
+    Pass clears that have not fired yet to a detached child process.
+    
+    The scheduler thread dies with the CLI, which usually exits long before
+    the clear is due. The child runs this module as a script with the
+    remaining delays and outlives the parent.
+    """
+    with _clear_condition:
+        now = time.monotonic()
+        delays = [str(max(0.0, deadline - now)) for deadline, _ in sorted(_clear_queue)]
+        del _clear_queue[:]
+    if not delays:
+        return
+        
+    kwargs = {}
+    if platform.system() == 'Windows':
+        kwargs['creationflags'] = (subprocess.DETACHED_PROCESS |
+                                   subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        kwargs['start_new_session'] = True
+    try:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__)] + delays,
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, close_fds=True, **kwargs)
+    except OSError as e:
+        print(f"Error scheduling clipboard clear: {e}")
+
 def copy_to_clipboard(text, clear_after=30):
     """
     Copy text to system clipboard and optionally clear after a delay.
@@ -15,59 +214,34 @@ def copy_to_clipboard(text, clear_after=30):
         True if successful, False otherwise
     """
     try:
-        system = platform.system()
-        
-        if system == 'Linux':
-            # Try xclip first, then xsel if xclip not available
-            try:
-                process = subprocess.Popen(['xclip', '-selection', 'clipboard'], 
-                                          stdin=subprocess.PIPE)
-                process.communicate(input=text.encode())
-                return process.returncode == 0
-            except FileNotFoundError:
-                try:
-                    process = subprocess.Popen(['xsel', '--clipboard', '--input'], 
-                                              stdin=subprocess.PIPE)
-                    process.communicate(input=text.encode())
-                    return process.returncode == 0
-                except FileNotFoundError:
-                    print("Error: xclip or xsel is required for clipboard functionality.")
-                    print("Install with: sudo apt-get install xclip or sudo apt-get install xsel")
-                    return False
-                
-        elif system == 'Darwin':  # macOS
-            process = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE)
-            process.communicate(input=text.encode())
-            return process.returncode == 0
-            
-        elif system == 'Windows':
-            # For Windows, use clip.exe
-            process = subprocess.Popen(['clip'], stdin=subprocess.PIPE)
-            process.communicate(input=text.encode())
-            return process.returncode == 0
+        if _backend is None:
+            system = platform.system()
+            if system == 'Linux':
+                print("Error: xclip or xsel is required for clipboard functionality.")
+                print("Install with: sudo apt-get install xclip or sudo apt-get install xsel")
+            else:
+                print(f"Clipboard functionality not supported on {system}")
+            return False
             
-        else:
-            print(f"Clipboard functionality not supported on {system}")
+        if not _backend.set(text):
             return False
             
     except Exception as e:
         print(f"Error copying to clipboard: {e}")
         return False
         
-    # Start a timer to clear the clipboard after the specified delay
+    # Schedule the clipboard to be cleared after the specified delay
     if clear_after > 0:
-        def clear_clipboard():
-            time.sleep(clear_after)
-            try:
-                # Copy empty string to clipboard
-                copy_to_clipboard("", clear_after=0)
-                print(f"Clipboard cleared after {clear_after} seconds")
-            except:
-                pass
-                
-        # Start the timer in a daemon thread
-        clear_thread = threading.Thread(target=clear_clipboard)
-        clear_thread.daemon = True
-        clear_thread.start()
+        _schedule_clear(clear_after)
         
-    return True
\ No newline at end of file
+    return True
+
+if __name__ == "__main__":
+    # Detached clear process: arguments are delays in seconds, in ascending order
+    start = time.monotonic()
+    for delay in sys.argv[1:]:
+        remaining = start + float(delay) - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        if _backend is not None:
+            _secure_clear(_backend)
@@ -1,19 +1,30 @@
 #!/usr/bin/env python3
 import argparse
 import sys
-import getpass
 import signal
 import time
 import threading
 
-from password_generator import generate_password
-from password_db import PasswordDatabase
-from clipboard import copy_to_clipboard
-
 # Global variables
-session_timer = None
+session_deadline = None
+session_timer = None  # Only used where SIGALRM is unavailable (Windows)
 SESSION_TIMEOUT = 60  # 60 seconds of inactivity
 
+# PasswordDatabase attributes dropped when the session is cleared
+SESSION_ATTRIBUTES = ("master_password", "encryption_key", "_conn", "_salt")
+
+# Characters rejected in titles, stripped in a single str.translate pass
+FORBIDDEN_TITLE_CHARS = str.maketrans('', '', '\'";\\')
+
+def validate_title(title):
+    """Validate a password title to prevent injection attacks, exiting on failure"""
+    if len(title) == 0:
+        print("Error: Title cannot be empty")
+        sys.exit(1)
+    if len(title.translate(FORBIDDEN_TITLE_CHARS)) != len(title):
+        print("Error: Title contains invalid characters")
+        sys.exit(1)
+
 def clear_session(db=None):
     """Clear sensitive data from memory after timeout"""
     print("\nSession timeout reached. Clearing sensitive data from memory.")
@@ -21,28 +32,57 @@ def clear_session(db=None):
     # Force Python's garbage collection
     import gc
     if db:
-        # Clear master password and encryption key
-        if hasattr(db, 'master_password'):
-            db.master_password = None
-        if hasattr(db, 'encryption_key'):
-            db.encryption_key = None
+        from password_db import zeroize
+        
+        # Release the cached database connection
+        db.close()
+        
+        # Overwrite the master password and encryption key, then drop all
+        # session state from the database object
+        state = db.__dict__
+        zeroize(state.get('master_password'))
+        encryption_key = state.get('encryption_key')
+        if encryption_key is not None:
+            zeroize(encryption_key._signing_key)
+            zeroize(encryption_key._encryption_key)
+        for attr in SESSION_ATTRIBUTES:
+            state.pop(attr, None)
     
     # Force garbage collection
     gc.collect()
     sys.exit(0)
     
 def start_session_timer(db=None):
-    """Start/reset the session timeout timer"""
-    global session_timer
+    """Start/reset the session timeout deadline"""
+    global session_deadline, session_timer
     
-    # Cancel existing timer if any
-    if session_timer:
-        session_timer.cancel()
+    session_deadline = time.monotonic() + SESSION_TIMEOUT
+    
+    if not hasattr(signal, 'SIGALRM'):
+        # No SIGALRM on Windows, fall back to a timer thread
+        if session_timer:
+            session_timer.cancel()
+        session_timer = threading.Timer(SESSION_TIMEOUT, clear_session, args=[db])
+        session_timer.daemon = True
+        session_timer.start()
+
+def timed_input(prompt, db=None):
+    """Read user input, clearing the session if the deadline passes while waiting"""
+    if session_deadline is None or not hasattr(signal, 'SIGALRM'):
+        return input(prompt)
         
-    # Start new timer
-    session_timer = threading.Timer(SESSION_TIMEOUT, clear_session, args=[db])
-    session_timer.daemon = True
-    session_timer.start()
+    remaining = session_deadline - time.monotonic()
+    if remaining <= 0:
+        clear_session(db)
+        
+    previous_handler = signal.signal(signal.SIGALRM,
+                                     lambda signum, frame: clear_session(db))
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        return input(prompt)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -95,6 +135,16 @@ def main():
     global SESSION_TIMEOUT
     SESSION_TIMEOUT = args.timeout
 
+    # Check if no action specified
+    if not (args.generate or args.copy or args.list or args.delete):
+        parser.print_help()
+        sys.exit(0)
+    
+    # Deferred so --help and no-op invocations skip loading cryptography/sqlite3
+    from password_generator import generate_password
+    from password_db import PasswordDatabase, zeroize
+    from clipboard import copy_to_clipboard
+    
     # Initialize database
     try:
         db = PasswordDatabase(master_password=args.master_password)
@@ -104,21 +154,10 @@ def main():
         print(f"Error initializing password database: {e}")
         sys.exit(1)
     
-    # Check if no action specified
-    if not (args.generate or args.copy or args.list or args.delete):
-        parser.print_help()
-        sys.exit(0)
-    
     # Handle generate command
     if args.generate:
-        # Validate title to prevent injection attacks
         title = args.generate
-        if len(title) == 0:
-            print("Error: Title cannot be empty")
-            sys.exit(1)
-        if "'" in title or '"' in title or ';' in title or '\\' in title:
-            print("Error: Title contains invalid characters")
-            sys.exit(1)
+        validate_title(title)
         
         # Generate password with specified options
         try:
@@ -143,7 +182,7 @@ def main():
                 
                 # Show password briefly
                 try:
-                    show_password = input("Show password? (y/n): ").lower() == 'y'
+                    show_password = timed_input("Show password? (y/n): ", db).lower() == 'y'
                     if show_password:
                         print(f"Password: {password}")
                 except (EOFError, IOError):
@@ -159,19 +198,15 @@ def main():
     
     # Handle copy command
     elif args.copy:
-        # Validate title to prevent injection attacks
         title = args.copy
-        if len(title) == 0:
-            print("Error: Title cannot be empty")
-            sys.exit(1)
-        if "'" in title or '"' in title or ';' in title or '\\' in title:
-            print("Error: Title contains invalid characters")
-            sys.exit(1)
+        validate_title(title)
         
         # Retrieve the password
         password = db.get_password(title)
         if password:
-            if copy_to_clipboard(password, clear_after=args.clipboard_timeout):
+            copied = copy_to_clipboard(password.decode(), clear_after=args.clipboard_timeout)
+            zeroize(password)
+            if copied:
                 if args.clipboard_timeout > 0:
                     print(f"Password for '{title}' copied to clipboard (will clear in {args.clipboard_timeout} seconds)")
                 else:
@@ -195,17 +230,11 @@ def main():
     
     # Handle delete command
     elif args.delete:
-        # Validate title to prevent injection attacks
         title = args.delete
-        if len(title) == 0:
-            print("Error: Title cannot be empty")
-            sys.exit(1)
-        if "'" in title or '"' in title or ';' in title or '\\' in title:
-            print("Error: Title contains invalid characters")
-            sys.exit(1)
+        validate_title(title)
         
         # Confirm deletion
-        confirm = input(f"Are you sure you want to delete the password for '{title}'? (y/n): ")
+        confirm = timed_input(f"Are you sure you want to delete the password for '{title}'? (y/n): ", db)
         if confirm.lower() == 'y':
             if db.delete_password(title):
                 print(f"Password for '{title}' deleted")
@@ -2,72 +2,169 @@ import sqlite3
 import os
 import sys
 import base64
+import hashlib
 import time
-import json
+import struct
 import ctypes
 import secrets
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import getpass
+from contextlib import contextmanager
 
-# Simple secure string wrapper
-class SecureString(str):
-    """A string that attempts to clear itself from memory when deleted"""
-    def __del__(self):
-        # This is a simplified version - the original had memory issues
-        pass
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Default database location, resolved once at import time. EZPASS_DIR
+# overrides the ~/.ezpass directory.
+DEFAULT_DB_DIR = os.environ.get("EZPASS_DIR") or os.path.join(os.path.expanduser("~"), ".ezpass")
+DEFAULT_DB_PATH = os.path.join(DEFAULT_DB_DIR, "passwords.db")
+
+# Failed-attempts file layout: attempt count, last attempt (unix seconds)
+ATTEMPTS_RECORD = struct.Struct("<II")
+
+def _lock_file(fd):
+    """Take an exclusive lock on an open file descriptor, blocking until granted"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, ATTEMPTS_RECORD.size)
+
+def _unlock_file(fd):
+    """Release a lock taken with _lock_file"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, ATTEMPTS_RECORD.size)
+
+def zeroize(buf):
+    """
+    Overwrite a buffer holding secret material with zeros, in place.
+    
+    Args:
+        buf: A bytearray, or a bytes object that is known not to be shared
+             (e.g. key material owned by a Fernet instance)
+    """
+    if not buf:
+        return
+    if isinstance(buf, bytearray):
+        ctypes.memset((ctypes.c_char * len(buf)).from_buffer(buf), 0, len(buf))
+    elif isinstance(buf, bytes) and len(buf) > 1:
+        # Immutable bytes have no writable buffer, so address the object's
+        # storage directly. Single-byte objects are interpreter-wide singletons
+        # and must never be touched.
+        ctypes.memset(ctypes.cast(buf, ctypes.c_void_p).value, 0, len(buf))
 
 class PasswordDatabase:
+    SQL_CREATE_TABLE = '''
+        CREATE TABLE IF NOT EXISTS passwords (
+            id INTEGER PRIMARY KEY,
+            title TEXT UNIQUE,
+            password TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        '''
+    SQL_UPSERT = '''
+        INSERT INTO passwords (title, password)
+        VALUES (?, ?)
+        ON CONFLICT(title) DO UPDATE SET
+            password = excluded.password,
+            updated_at = CURRENT_TIMESTAMP
+        '''
+    SQL_GET = 'SELECT password FROM passwords WHERE title = ?'
+    SQL_LIST = 'SELECT title FROM passwords ORDER BY title'
+    SQL_GET_ALL = 'SELECT title, password FROM passwords ORDER BY title'
+    SQL_DELETE = 'DELETE FROM passwords WHERE title = ?'
+    SQL_FIRST = 'SELECT password FROM passwords LIMIT 1'
+    
     def __init__(self, db_path=None, master_password=None):
         """
         Initialize the password database with encryption.
         
         Args:
-            db_path: Path to the database file (default: ~/.ezpass/passwords.db)
+            db_path: Path to the database file (default: DEFAULT_DB_PATH)
             master_password: Master password for encryption/decryption
         """
         if db_path is None:
-            # Use default path: ~/.ezpass/passwords.db
-            home_dir = os.path.expanduser("~")
-            db_dir = os.path.join(home_dir, ".ezpass")
-            os.makedirs(db_dir, exist_ok=True)
-            self.db_path = os.path.join(db_dir, "passwords.db")
+            # Use default path: ~/.ezpass/passwords.db (or $EZPASS_DIR/passwords.db)
+            os.makedirs(DEFAULT_DB_DIR, exist_ok=True)
+            self.db_path = DEFAULT_DB_PATH
         else:
             self.db_path = db_path
             
         # Store path to attempts file for later use
         self.attempts_file = os.path.join(os.path.dirname(self.db_path), ".attempts")
+        
+        # Read the KDF salt once up front
+        self._salt = self._load_salt()
             
-        # Get master password if not provided
+        # Get master password if not provided. It is kept in a mutable
+        # bytearray so it can be overwritten once it is no longer needed.
         if master_password is None:
             self.master_password = self._get_master_password()
         else:
-            self.master_password = master_password
+            self.master_password = bytearray(master_password.encode())
             
         try:
-            # Derive encryption key from master password
-            self.encryption_key = self._derive_key(self.master_password)
+            # Derive encryption key from master password, then wipe the password
+            # whether or not derivation succeeded
+            try:
+                self.encryption_key = self._derive_key(self.master_password, self._salt)
+            finally:
+                zeroize(self.master_password)
             
             # Initialize the database
             self._init_db()
             
             # Reset attempts counter on successful authentication
             if os.path.exists(self.db_path) and os.path.exists(self.attempts_file):
-                with open(self.attempts_file, 'w') as f:
-                    json.dump({"count": 0, "last_attempt": time.time()}, f)
+                self._update_attempts(lambda count, last: (0, int(time.time())))
         except Exception as e:
-            # Increase attempts counter on failure
+            # Increase attempts counter and record the time on failure
             if os.path.exists(self.attempts_file):
                 try:
-                    with open(self.attempts_file, 'r') as f:
-                        attempts_data = json.load(f)
-                    attempts_data["count"] += 1
-                    with open(self.attempts_file, 'w') as f:
-                        json.dump(attempts_data, f)
-                except:
+                    self._update_attempts(lambda count, last: (count + 1, int(time.time())))
+                except OSError:
                     pass
             raise e
+    
+    def _update_attempts(self, update=None):
+        """
+        Read, and optionally rewrite, the failed-attempts record under a file lock.
+        
+        Args:
+            update: Optional function mapping (count, last_attempt) to the new
+                    (count, last_attempt) pair to store
+            
+        Returns:
+            The (count, last_attempt) pair as it was before the update
+        """
+        fd = os.open(self.attempts_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            _lock_file(fd)
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                # Read one byte extra so a record of the wrong size (e.g. the
+                # old JSON format) is detected and treated as a fresh counter
+                buf = os.read(fd, ATTEMPTS_RECORD.size + 1)
+                if len(buf) == ATTEMPTS_RECORD.size:
+                    attempts = ATTEMPTS_RECORD.unpack(buf)
+                else:
+                    attempts = (0, 0)
+                    
+                if update is not None:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, ATTEMPTS_RECORD.pack(*update(*attempts)))
+                    os.ftruncate(fd, ATTEMPTS_RECORD.size)
+                return attempts
+            finally:
+                _unlock_file(fd)
+        finally:
+            os.close(fd)
         
     def _get_master_password(self):
         """Prompt user for master password or create a new one."""
@@ -86,36 +183,39 @@ class PasswordDatabase:
                         print("Password too short. Must be at least 12 characters.")
                         continue
                         
-                    has_upper = any(c.isupper() for c in password)
-                    has_lower = any(c.islower() for c in password)
-                    has_digit = any(c.isdigit() for c in password)
-                    has_special = any(not c.isalnum() for c in password)
+                    # Collect character classes in one pass:
+                    # 1 = lowercase, 2 = uppercase, 4 = digit, 8 = special
+                    classes = 0
+                    for c in password:
+                        if c.islower():
+                            classes |= 1
+                        elif c.isupper():
+                            classes |= 2
+                        elif c.isdigit():
+                            classes |= 4
+                        elif not c.isalnum():
+                            classes |= 8
+                        if classes == 0xF:
+                            break
                     
-                    if not (has_upper and has_lower and has_digit and has_special):
+                    if classes != 0xF:
                         print("Password must contain uppercase, lowercase, digits, and special characters.")
                         continue
                     
                     confirm = getpass.getpass("Confirm master password: ")
                     if password == confirm:
-                        return password
+                        return bytearray(password.encode())
                     print("Passwords do not match. Please try again.")
             else:
                 # Existing database, prompt for password
-                # Check for attempt tracking
-                attempts_file = os.path.join(os.path.dirname(self.db_path), ".attempts")
-                attempts_data = {"count": 0, "last_attempt": 0}
-                
-                if os.path.exists(attempts_file):
-                    try:
-                        with open(attempts_file, 'r') as f:
-                            attempts_data = json.load(f)
-                    except:
-                        pass  # If file is corrupted, use default values
+                # Check for attempt tracking (this also creates the attempts
+                # file, so __init__ can record a failure if the password is wrong)
+                count, last_attempt = self._update_attempts()
                 
                 # Check if we need to enforce delay (after 3 failed attempts)
                 current_time = time.time()
-                if attempts_data["count"] >= 3:
-                    time_since_last = current_time - attempts_data["last_attempt"]
+                if count >= 3:
+                    time_since_last = current_time - last_attempt
                     delay_needed = max(0, 5 - time_since_last)  # 5 second delay
                     
                     if delay_needed > 0:
@@ -124,67 +224,139 @@ class PasswordDatabase:
                 
                 password = getpass.getpass("Enter master password: ")
                 
-                # Update attempts tracking
-                attempts_data["count"] += 1
-                attempts_data["last_attempt"] = current_time
-                
-                with open(attempts_file, 'w') as f:
-                    json.dump(attempts_data, f)
-                
-                return password
+                return bytearray(password.encode())
         except (EOFError, IOError):
             # Handle non-interactive environments
             print("Error: Master password is required.")
             print("Use --master-password option for non-interactive mode.")
             sys.exit(1)
     
-    def _derive_key(self, password):
-        """Derive encryption key from master password."""
-        # Generate a random salt for each new database
+    def _load_salt(self):
+        """Read the KDF salt for this database, creating it on first use."""
         salt_file = os.path.join(os.path.dirname(self.db_path), ".salt")
         
-        if not os.path.exists(salt_file):
-            # Create new salt if it doesn't exist
-            import secrets
-            salt = secrets.token_bytes(16)
-            with open(salt_file, 'wb') as f:
-                f.write(salt)
-            # Set permissions to restrict access
-            os.chmod(salt_file, 0o600)
-        else:
+        try:
             # Read existing salt
             with open(salt_file, 'rb') as f:
-                salt = f.read()
+                return f.read(16)
+        except FileNotFoundError:
+            pass
+            
+        # Generate a random salt for each new database, created with
+        # permissions that restrict access from the start
+        salt = os.urandom(16)
+        fd = os.open(salt_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(salt)
+        return salt
     
-        # Use enhanced PBKDF2 for key derivation with increased iterations
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=310000,  # Increased from 100000 for better security
+    def _derive_key(self, password, salt):
+        """Derive the master key from the master password (bytes) and unwrap the data key."""
+        # Imported here so loading this module doesn't pull in OpenSSL via cffi
+        from cryptography.fernet import Fernet
+        
+        # Use enhanced PBKDF2 for key derivation with increased iterations.
+        # hashlib runs the whole iteration loop inside OpenSSL in one call.
+        raw_key = hashlib.pbkdf2_hmac(
+            'sha256',
+            password,
+            salt,
+            310000,  # Increased from 100000 for better security
+            dklen=32,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return Fernet(key)
+        master_key = base64.urlsafe_b64encode(raw_key)
+        
+        # The master key only wraps the data key that actually encrypts entries
+        data_key = self._unwrap_data_key(Fernet(master_key), master_key)
+        fernet = Fernet(data_key)
+        
+        # Fernet keeps its own decoded copy; wipe the intermediate key material
+        for key_material in (raw_key, master_key, data_key):
+            zeroize(key_material)
+        return fernet
+    
+    def _unwrap_data_key(self, wrapper, master_key):
+        """
+        Load the data key from the .keywrap file, creating it on first use.
+        
+        The .keywrap file belongs to the database next to it: entries cannot be
+        decrypted without it, so both must be backed up together.
+        
+        Args:
+            wrapper: Fernet instance keyed with the PBKDF2 master key
+            master_key: The PBKDF2 master key, used as the data key for
+                databases created before key wrapping was introduced
+            
+        Returns:
+            The unwrapped data key (urlsafe base64, usable with Fernet)
+        """
+        keywrap_file = os.path.join(os.path.dirname(self.db_path), ".keywrap")
+        
+        from cryptography.fernet import InvalidToken
+        
+        if not os.path.exists(self.db_path):
+            # New database. Any .keywrap left behind belongs to a database that
+            # was removed, so it is replaced with a fresh data key.
+            data_key = base64.urlsafe_b64encode(secrets.token_bytes(32))
+        elif os.path.exists(keywrap_file):
+            with open(keywrap_file, 'rb') as f:
+                wrapped_key = f.read()
+            try:
+                return wrapper.decrypt(wrapped_key)
+            except InvalidToken:
+                raise ValueError("Incorrect master password")
+        else:
+            # Existing entries were encrypted with the master key directly.
+            # Check it against a stored entry before wrapping it, otherwise a
+            # wrong password would be persisted as the data key.
+            encrypted = self._first_encrypted_password()
+            if encrypted is not None:
+                try:
+                    wrapper.decrypt(encrypted.encode())
+                except InvalidToken:
+                    raise ValueError("Incorrect master password")
+            data_key = master_key
+            
+        # Write to a temporary file created with restricted permissions, then
+        # atomically replace any stale .keywrap
+        temp_file = keywrap_file + ".tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(wrapper.encrypt(data_key))
+        os.replace(temp_file, keywrap_file)
+        return data_key
+    
+    def _first_encrypted_password(self):
+        """Return one stored ciphertext from the database file, or None if it is empty."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute(self.SQL_FIRST).fetchone()
+        except sqlite3.OperationalError:
+            # No passwords table yet
+            row = None
+        finally:
+            conn.close()
+        return row[0] if row else None
     
     def _init_db(self):
         """Initialize the database with tables if they don't exist."""
-        # Create new database file or open existing one
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Create new database file or open existing one. The connection is kept
+        # open for the lifetime of this object and runs in autocommit mode.
+        # The SQL_* statements above are the only ones issued, so a small
+        # statement cache keeps every one of them prepared.
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                     check_same_thread=False,
+                                     cached_statements=16)
         
-        # Create passwords table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY,
-            title TEXT UNIQUE,
-            password TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+        # WAL + synchronous=NORMAL only fsyncs at checkpoint instead of per write
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        # 2 MB page cache, enough to hold a typical password database entirely
+        self._conn.execute("PRAGMA cache_size=-2048")
         
-        conn.commit()
-        conn.close()
+        # Create passwords table
+        self._conn.execute(self.SQL_CREATE_TABLE)
         
         # Set secure file permissions (0600 = user can read/write, group/others have no permissions)
         try:
@@ -197,6 +369,47 @@ class PasswordDatabase:
             print("Warning: Unable to set secure file permissions on the database.")
             pass  # Don't fail if permissions can't be set (e.g. on Windows)
     
+    def close(self):
+        """Close the cached database connection."""
+        conn = getattr(self, '_conn', None)
+        if conn is not None:
+            conn.close()
+            self._conn = None
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group several writes into a single transaction.
+        
+        The connection runs in autocommit mode, so each write otherwise
+        commits on its own. Use this around bulk operations:
+        
+            with db.batch():
+                for title, password in entries:
+                    db.add_password(title, password)
+        
+        Inside a batch, add_password and delete_password raise sqlite3.Error
+        instead of returning False, so a failed write rolls back the whole
+        transaction rather than committing the rows that succeeded.
+        
+        Batches cannot be nested; starting one inside another raises
+        RuntimeError.
+        """
+        if self._conn.in_transaction:
+            raise RuntimeError("A batch is already in progress")
+            
+        self._conn.execute("BEGIN")
+        try:
+            yield self
+        except BaseException:
+            # SQLite may already have rolled back on its own (e.g. disk full),
+            # in which case ROLLBACK would mask the original error
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+        else:
+            self._conn.execute("COMMIT")
+    
     def add_password(self, title, password):
         """
         Add or update a password in the database.
@@ -208,26 +421,16 @@ class PasswordDatabase:
         # Encrypt the password
         encrypted_password = self.encryption_key.encrypt(password.encode()).decode()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
             # Try to insert, if title exists, update
-            cursor.execute('''
-            INSERT INTO passwords (title, password)
-            VALUES (?, ?)
-            ON CONFLICT(title) DO UPDATE SET
-                password = excluded.password,
-                updated_at = CURRENT_TIMESTAMP
-            ''', (title, encrypted_password))
-            
-            conn.commit()
+            self._conn.execute(self.SQL_UPSERT, (title, encrypted_password))
             return True
         except sqlite3.Error as e:
+            if self._conn.in_transaction:
+                # Let batch() roll back the whole transaction
+                raise
             print(f"Database error: {e}")
             return False
-        finally:
-            conn.close()
     
     def get_password(self, title):
         """
@@ -237,19 +440,17 @@ class PasswordDatabase:
             title: The label/title of the password to retrieve
             
         Returns:
-            The decrypted password or None if not found
+            The decrypted password as a bytearray, or None if not found
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('SELECT password FROM passwords WHERE title = ?', (title,))
-            result = cursor.fetchone()
+            result = self._conn.execute(self.SQL_GET, (title,)).fetchone()
             
             if result:
                 encrypted_password = result[0]
-                # Create a secure string that will be safer in memory
-                decrypted_password = SecureString(self.encryption_key.decrypt(encrypted_password.encode()).decode())
+                # Hand back a bytearray so the caller can zeroize it after use
+                plaintext = self.encryption_key.decrypt(encrypted_password.encode())
+                decrypted_password = bytearray(plaintext)
+                zeroize(plaintext)
                 return decrypted_password
             return None
         except sqlite3.Error as e:
@@ -258,8 +459,6 @@ class PasswordDatabase:
         except Exception as e:
             print(f"Decryption error: {e}")
             return None
-        finally:
-            conn.close()
     
     def list_passwords(self):
         """
@@ -268,17 +467,39 @@ class PasswordDatabase:
         Returns:
             List of password titles
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('SELECT title FROM passwords ORDER BY title')
-            return [row[0] for row in cursor.fetchall()]
+            return [row[0] for row in self._conn.execute(self.SQL_LIST)]
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return []
-        finally:
-            conn.close()
+    
+    def get_all_passwords(self):
+        """
+        Retrieve and decrypt every stored password in a single query.
+        
+        Entries that fail to decrypt are reported and left out of the result.
+        
+        Returns:
+            Dict mapping each title to its decrypted password (as a bytearray)
+        """
+        try:
+            rows = self._conn.execute(self.SQL_GET_ALL).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return {}
+            
+        fernet = self.encryption_key
+        passwords = {}
+        for title, encrypted in rows:
+            try:
+                plaintext = fernet.decrypt(encrypted.encode())
+            except Exception as e:
+                print(f"Decryption error for '{title}': {e}")
+                continue
+            # Hand back bytearrays so the caller can zeroize them after use
+            passwords[title] = bytearray(plaintext)
+            zeroize(plaintext)
+        return passwords
     
     def delete_password(self, title):
         """
@@ -290,15 +511,12 @@ class PasswordDatabase:
         Returns:
             True if deleted successfully, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('DELETE FROM passwords WHERE title = ?', (title,))
-            conn.commit()
+            cursor = self._conn.execute(self.SQL_DELETE, (title,))
             return cursor.rowcount > 0
         except sqlite3.Error as e:
+            if self._conn.in_transaction:
+                # Let batch() roll back the whole transaction
+                raise
             print(f"Database error: {e}")
-            return False
-        finally:
-            conn.close()
\ No newline at end of file
+            return False
\ No newline at end of file
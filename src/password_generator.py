@@ -1,6 +1,95 @@
+import os
+import base64
 import string
 import secrets
-import random
+import itertools
+
+# CSPRNG-backed Random instance for the final permutation
+_sysrand = secrets.SystemRandom()
+
+# Character classes in (lowercase, uppercase, digits, special) flag order
+_CLASSES = (string.ascii_lowercase, string.ascii_uppercase, string.digits,
+            string.punctuation)
+
+# Base64url alphabet
+_URLSAFE = string.ascii_letters + string.digits + '-_'
+
+# Selected classes, combined alphabet and, for alphabets that are a subset of
+# base64url, a str.translate table deleting every other base64url character.
+# Keyed on (use_lowercase, use_uppercase, use_digits, use_special) for each of
+# the 15 valid flag combinations.
+def _build_charsets():
+    charsets = {}
+    for flags in itertools.product((True, False), repeat=4):
+        if any(flags):
+            selected = tuple(c for c, used in zip(_CLASSES, flags) if used)
+            chars = ''.join(selected)
+            urlsafe_filter = None
+            if not flags[3]:
+                excluded = ''.join(c for c in _URLSAFE if c not in chars)
+                urlsafe_filter = str.maketrans('', '', excluded)
+            charsets[flags] = (selected, chars, urlsafe_filter)
+    return charsets
+
+_CHARSETS = _build_charsets()
+
+def _draw(chars, count):
+    """
+    Draw characters uniformly from chars using bulk os.urandom reads.
+    
+    Each random byte is masked down to the smallest power of two covering
+    len(chars) and rejected if it falls outside, which keeps the draw unbiased.
+    
+    Args:
+        chars: The alphabet to draw from (at most 256 characters)
+        count: Number of characters to draw
+        
+    Returns:
+        A list of count characters
+    """
+    size = len(chars)
+    mask = (1 << (size - 1).bit_length()) - 1
+    result = []
+    while len(result) < count:
+        # Over-draw so a single read almost always covers the rejections
+        for byte in os.urandom((count - len(result)) * 2):
+            index = byte & mask
+            if index < size:
+                result.append(chars[index])
+                if len(result) == count:
+                    break
+    return result
+
+def _token_password(classes, urlsafe_filter, length):
+    """
+    Build a password from filtered base64url-encoded random bytes.
+    
+    The random input is always a multiple of 3 bytes, so the encoding has no
+    partial trailing group and every character carries a full 6 random bits.
+    Base64url characters outside the alphabet are then deleted in one C-level
+    str.translate pass, which leaves a uniform draw over the alphabet.
+    Candidates missing one of the selected classes are rejected and redrawn.
+    
+    Args:
+        classes: The selected character classes
+        urlsafe_filter: Translation table deleting characters outside the alphabet
+        length: Length of the password
+        
+    Returns:
+        A randomly generated password as string
+    """
+    # 3 random bytes encode to 4 characters
+    token_bytes = 3 * -(-length // 4)
+    while True:
+        candidate = ''
+        while len(candidate) < length:
+            token = base64.urlsafe_b64encode(secrets.token_bytes(token_bytes))
+            candidate += token.decode().translate(urlsafe_filter)
+        candidate = candidate[:length]
+        
+        present = set(candidate)
+        if all(not present.isdisjoint(char_class) for char_class in classes):
+            return candidate
 
 def generate_password(length=16, use_lowercase=True, use_uppercase=True, 
                       use_digits=True, use_special=True):
@@ -17,36 +106,29 @@ def generate_password(length=16, use_lowercase=True, use_uppercase=True,
     Returns:
         A randomly generated password as string
     """
-    # Define character sets
-    chars = ""
-    if use_lowercase:
-        chars += string.ascii_lowercase
-    if use_uppercase:
-        chars += string.ascii_uppercase
-    if use_digits:
-        chars += string.digits
-    if use_special:
-        chars += string.punctuation
-        
-    if not chars:
+    # Look up the precomputed character sets
+    try:
+        classes, chars, urlsafe_filter = _CHARSETS[(bool(use_lowercase), bool(use_uppercase),
+                                                    bool(use_digits), bool(use_special))]
+    except KeyError:
         raise ValueError("At least one character set must be selected")
         
+    # Without special characters the alphabet is a subset of base64url, so
+    # draw in bulk from base64url-encoded random bytes instead
+    if urlsafe_filter is not None and length >= len(classes):
+        return _token_password(classes, urlsafe_filter, length)
+        
     # Ensure at least one character from each selected character set
     password = []
-    if use_lowercase:
-        password.append(secrets.choice(string.ascii_lowercase))
-    if use_uppercase:
-        password.append(secrets.choice(string.ascii_uppercase))
-    if use_digits:
-        password.append(secrets.choice(string.digits))
-    if use_special:
-        password.append(secrets.choice(string.punctuation))
+    for char_class in classes:
+        password.extend(_draw(char_class, 1))
         
     # Fill the rest of the password
     remaining_length = length - len(password)
-    password.extend(secrets.choice(chars) for _ in range(remaining_length))
+    if remaining_length > 0:
+        password.extend(_draw(chars, remaining_length))
     
     # Shuffle password to avoid predictable pattern
-    random.shuffle(password)
+    _sysrand.shuffle(password)
     
-    return ''.join(password)
\ No newline at end of file
+    return ''.join(password)